@@ -8,14 +8,16 @@ SQLAlchemy (`Session`) inyectada por FastAPI a través de la dependencia `get_db
 Diseño elegido:
 - Cada operación devuelve el modelo ORM (cuando aplica) para que FastAPI lo
   serialice mediante los esquemas Pydantic configurados con `from_attributes`.
-- Funciones de reportes retornan filas agregadas (tuplas nombradas) que luego
-  se transforman en dict en las rutas.
+- Funciones de reportes retornan filas agregadas como mapeos (`RowMapping`) cuyas
+  claves ya coinciden con los esquemas de reporte, por lo que las rutas las
+  serializan directamente sin reconstruir cada fila.
 """
 
+import os
 from typing import List, Optional
-from uuid import uuid4
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from uuid import UUID, uuid4
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import bindparam, delete, func, inspect, select, update
 
 from models import Cliente, Producto, Venta, DetalleVenta
 from schemas import (
@@ -25,6 +27,73 @@ from schemas import (
     DetalleVentaCreateStandalone, DetalleVentaUpdate
 )
 
+# -------------------- Consultas precompiladas --------------------
+# Las consultas más frecuentes se construyen una sola vez al importar el módulo y se
+# parametrizan con `bindparam`; así cada petición solo aporta los valores y SQLAlchemy
+# reutiliza la forma compilada desde su caché en lugar de reconstruir la consulta.
+# Las búsquedas por ID (`get_*`) usan `Session.get`, que primero revisa el identity map de
+# la sesión (una por petición, ver `get_db`) y solo emite el SELECT si el registro no
+# está cargado.
+
+_SEL_DETALLES_POR_VENTA = (
+    select(DetalleVenta)
+    .where(DetalleVenta.venta_id == bindparam("venta_id"))
+    .order_by(DetalleVenta.id)
+)
+_SEL_VENTA_EXISTE = select(Venta.id).where(Venta.id == bindparam("id"))
+
+_SEL_PRODUCTOS_MAS_VENDIDOS = (
+    select(
+        DetalleVenta.producto_id.label("producto_id"),
+        Producto.nombre.label("nombre"),
+        func.sum(DetalleVenta.cantidad).label("total_cantidad"),
+        func.sum(DetalleVenta.subtotal).label("total_ingresos"),
+    )
+    .join(Producto, Producto.id == DetalleVenta.producto_id)
+    .group_by(DetalleVenta.producto_id, Producto.nombre)
+    .order_by(func.sum(DetalleVenta.cantidad).desc())
+    .limit(bindparam("limit"))
+)
+
+_SEL_CLIENTES_CON_MAS_VENTAS = (
+    select(
+        Venta.cliente_id.label("cliente_id"),
+        Cliente.nombre.label("nombre"),
+        func.count(Venta.id).label("total_ventas"),
+        func.sum(Venta.total).label("total_monto"),
+    )
+    .join(Cliente, Cliente.id == Venta.cliente_id)
+    .group_by(Venta.cliente_id, Cliente.nombre)
+    .order_by(func.count(Venta.id).desc())
+    .limit(bindparam("limit"))
+)
+
+def _subtotal(precio: int, descuento: int, cantidad: int) -> int:
+    """ Subtotal de un detalle: `(precio - descuento) * cantidad`. """
+    return (precio - descuento) * cantidad
+
+def _uuids(n: int) -> List[str]:
+    """
+    Generar `n` UUID4 a partir de una única lectura de `os.urandom`.
+
+    Equivale a llamar `uuid4()` n veces, pero con una sola llamada al sistema para
+    todo el lote (útil al crear una venta con muchos detalles).
+    """
+    buf = os.urandom(16 * n)
+    return [str(UUID(bytes=buf[i:i + 16], version=4)) for i in range(0, 16 * n, 16)]
+
+def _refrescar_pendientes(db: Session, obj) -> None:
+    """
+    Refresca solo las columnas que hayan quedado sin cargar tras el commit.
+
+    Los valores generados en Python (uuid, timestamps) y el `id` asignado por la BD ya
+    están en el objeto, por lo que normalmente no se emite ningún SELECT adicional.
+    """
+    state = inspect(obj)
+    pendientes = [attr.key for attr in state.mapper.column_attrs if attr.key in state.unloaded]
+    if pendientes:
+        db.refresh(obj, attribute_names=pendientes)
+
 # -------------------- Clientes --------------------
 
 def create_cliente(db: Session, data: ClienteCreate) -> Cliente:
@@ -37,16 +106,22 @@ def create_cliente(db: Session, data: ClienteCreate) -> Cliente:
     )
     db.add(cliente)
     db.commit()
-    db.refresh(cliente)
+    _refrescar_pendientes(db, cliente)
     return cliente
 
 def get_cliente(db: Session, cliente_id: int) -> Optional[Cliente]:
     """ Obtener cliente por ID (o None si no existe). """
-    return db.query(Cliente).filter(Cliente.id == cliente_id).first()
+    return db.get(Cliente, cliente_id)
 
-def list_clientes(db: Session, skip: int = 0, limit: int = 100) -> List[Cliente]:
-    """ Listar clientes con paginación simple (offset/limit). """
-    return db.query(Cliente).offset(skip).limit(limit).all()
+def list_clientes(db: Session, after_id: int = 0, limit: int = 100) -> List[Cliente]:
+    """
+    Listar clientes con paginación por clave (keyset).
+
+    Devuelve los clientes con `id > after_id` ordenados por `id`; para la página
+    siguiente se pasa como `after_id` el último `id` recibido. A diferencia de
+    OFFSET, el costo no crece con la profundidad de la página (usa el índice de `id`).
+    """
+    return db.query(Cliente).filter(Cliente.id > after_id).order_by(Cliente.id).limit(limit).all()
 
 def update_cliente(db: Session, cliente_id: int, data: ClienteUpdate) -> Optional[Cliente]:
     """
@@ -61,17 +136,21 @@ def update_cliente(db: Session, cliente_id: int, data: ClienteUpdate) -> Optiona
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(cliente, field, value)
     db.commit()
-    db.refresh(cliente)
     return cliente
 
 def delete_cliente(db: Session, cliente_id: int) -> bool:
-    """ Eliminar un cliente. Devuelve True si se borró, False si no existía. """
-    cliente = get_cliente(db, cliente_id)
-    if not cliente:
-        return False
-    db.delete(cliente)
+    """
+    Eliminar un cliente. Devuelve True si se borró, False si no existía.
+
+    Se emite un único DELETE; sus ventas (y los detalles de éstas) se eliminan en la
+    base de datos mediante `ON DELETE CASCADE`.
+    """
+    result = db.execute(delete(Cliente).where(Cliente.id == cliente_id))
     db.commit()
-    return True
+    # El cascade ocurre en la BD: las ventas/detalles ya cargados en la sesión no se
+    # enteran, así que se vacía la sesión para que un `get_*` posterior vuelva a la BD.
+    db.expunge_all()
+    return result.rowcount > 0
 
 # -------------------- Productos --------------------
 
@@ -85,16 +164,16 @@ def create_producto(db: Session, data: ProductoCreate) -> Producto:
     )
     db.add(producto)
     db.commit()
-    db.refresh(producto)
+    _refrescar_pendientes(db, producto)
     return producto
 
 def get_producto(db: Session, producto_id: int) -> Optional[Producto]:
     """ Obtener producto por ID. """
-    return db.query(Producto).filter(Producto.id == producto_id).first()
+    return db.get(Producto, producto_id)
 
-def list_productos(db: Session, skip: int = 0, limit: int = 100) -> List[Producto]:
-    """ Listar productos con paginación simple. """
-    return db.query(Producto).offset(skip).limit(limit).all()
+def list_productos(db: Session, after_id: int = 0, limit: int = 100) -> List[Producto]:
+    """ Listar productos con paginación por clave (`id > after_id`). """
+    return db.query(Producto).filter(Producto.id > after_id).order_by(Producto.id).limit(limit).all()
 
 def update_producto(db: Session, producto_id: int, data: ProductoUpdate) -> Optional[Producto]:
     """ Actualizar parcialmente un producto existente. """
@@ -104,17 +183,13 @@ def update_producto(db: Session, producto_id: int, data: ProductoUpdate) -> Opti
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(producto, field, value)
     db.commit()
-    db.refresh(producto)
     return producto
 
 def delete_producto(db: Session, producto_id: int) -> bool:
     """ Eliminar producto. True si se eliminó, False si no existía. """
-    producto = get_producto(db, producto_id)
-    if not producto:
-        return False
-    db.delete(producto)
+    result = db.execute(delete(Producto).where(Producto.id == producto_id))
     db.commit()
-    return True
+    return result.rowcount > 0
 
 # -------------------- Ventas --------------------
 
@@ -123,53 +198,71 @@ def create_venta(db: Session, data: VentaCreate) -> Venta:
     Crear una venta con sus detalles.
 
     Flujo:
-    1. Se crea la cabecera (Venta) para obtener su ID.
-    2. Se calculan subtotales de cada detalle: `(precio - descuento) * cantidad`.
-    3. Se suman al total y se insertan los registros en `detalles_ventas`.
+    1. Se calculan subtotales de cada detalle: `(precio - descuento) * cantidad`.
+    2. Se inserta la cabecera (Venta) ya con su total para obtener su ID.
+    3. Se insertan todos los registros de `detalles_ventas` (con su `subtotal`) en una
+       sola llamada executemany (`bulk_insert_mappings`), sin la sobrecarga del unit of
+       work por cada detalle.
+
+    Todo ocurre en una sola transacción: dos sentencias INSERT (la de detalles se ejecuta
+    una vez por fila dentro del executemany) y un commit.
     """
     
+    venta_uuid, *detalle_uuids = _uuids(len(data.detalles) + 1)
+    subtotales = [_subtotal(det.precio, det.descuento, det.cantidad) for det in data.detalles]
+    # El total se calcula antes de insertar la cabecera para que viaje en el mismo
+    # INSERT y no requiera un UPDATE posterior de la venta.
     venta = Venta(
-        uuid=str(uuid4()),
+        uuid=venta_uuid,
         cliente_id=data.cliente_id,
+        total=sum(subtotales),
     )
     db.add(venta)
-    db.flush()  # Obtenemos ID antes de crear detalles
-
-    total = 0
-    for det in data.detalles:
-        subtotal = (det.precio - det.descuento) * det.cantidad
-        total += subtotal
-        detalle = DetalleVenta(
-            uuid=str(uuid4()),
-            producto_id=det.producto_id,
-            venta_id=venta.id,
-            precio=det.precio,
-            descuento=det.descuento,
-            cantidad=det.cantidad,
-        )
-        db.add(detalle)
-    venta.total = total  # Se persiste al hacer commit
+    db.flush()  # Único flush: obtenemos el ID antes de insertar los detalles
+    rows = [
+        {
+            "uuid": det_uuid,
+            "producto_id": det.producto_id,
+            "venta_id": venta.id,
+            "precio": det.precio,
+            "descuento": det.descuento,
+            "cantidad": det.cantidad,
+            "subtotal": subtotal,
+        }
+        for det, det_uuid, subtotal in zip(data.detalles, detalle_uuids, subtotales)
+    ]
+    if rows:
+        db.bulk_insert_mappings(DetalleVenta, rows)
 
     db.commit()
-    db.refresh(venta)
-    return venta
+    return get_venta(db, venta.id)
 
 def get_venta(db: Session, venta_id: int) -> Optional[Venta]:
-    """ Obtener venta por ID. """
-    return db.query(Venta).filter(Venta.id == venta_id).first()
+    """ Obtener venta por ID (si se consulta a la BD, sus detalles se cargan en una sola consulta adicional). """
+    return db.get(Venta, venta_id, options=[selectinload(Venta.detalles)])
+
+def list_ventas(db: Session, after_id: int = 0, limit: int = 100) -> List[Venta]:
+    """
+    Listar ventas con paginación por clave (`id > after_id`).
 
-def list_ventas(db: Session, skip: int = 0, limit: int = 100) -> List[Venta]:
-    """ Listar ventas (sin filtros adicionales). """
-    return db.query(Venta).offset(skip).limit(limit).all()
+    Los detalles de todas las ventas de la página se cargan con `selectinload` en una
+    sola consulta `IN (...)`, evitando un SELECT por venta al serializar.
+    """
+    return (
+        db.query(Venta)
+        .options(selectinload(Venta.detalles))
+        .filter(Venta.id > after_id)
+        .order_by(Venta.id)
+        .limit(limit)
+        .all()
+    )
 
 def delete_venta(db: Session, venta_id: int) -> bool:
-    """ Eliminar venta (cascade elimina detalles). """
-    venta = get_venta(db, venta_id)
-    if not venta:
-        return False
-    db.delete(venta)
+    """ Eliminar venta (`ON DELETE CASCADE` elimina sus detalles en la base de datos). """
+    result = db.execute(delete(Venta).where(Venta.id == venta_id))
     db.commit()
-    return True
+    db.expunge_all()  # Sus detalles se borran por cascade en la BD (ver `delete_cliente`)
+    return result.rowcount > 0
 
 def update_venta(db: Session, venta_id: int, data: VentaUpdate) -> Optional[Venta]:
     """Actualizar parcialmente la cabecera de una venta."""
@@ -179,7 +272,6 @@ def update_venta(db: Session, venta_id: int, data: VentaUpdate) -> Optional[Vent
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(venta, field, value)
     db.commit()
-    db.refresh(venta)
     return venta
 
 # -------------------- Reportes --------------------
@@ -191,54 +283,29 @@ def productos_mas_vendidos(db: Session, limit: int = 10):
     También retorna el total de ingresos generados considerando descuentos.
     """
     
-    q = (
-        db.query(
-            DetalleVenta.producto_id.label("producto_id"),
-            Producto.nombre.label("nombre"),
-            func.sum(DetalleVenta.cantidad).label("total_cantidad"),
-            func.sum((DetalleVenta.precio - DetalleVenta.descuento) * DetalleVenta.cantidad).label("total_ingresos"),
-        )
-        .join(Producto, Producto.id == DetalleVenta.producto_id)
-        .group_by(DetalleVenta.producto_id, Producto.nombre)
-        .order_by(func.sum(DetalleVenta.cantidad).desc())
-        .limit(limit)
-    )
-    return q.all()
+    return db.execute(_SEL_PRODUCTOS_MAS_VENDIDOS, {"limit": limit}).mappings().all()
 
 def clientes_con_mas_ventas(db: Session, limit: int = 10):
     """ Ranking de clientes por número de ventas y monto total. """
-    q = (
-        db.query(
-            Venta.cliente_id.label("cliente_id"),
-            Cliente.nombre.label("nombre"),
-            func.count(Venta.id).label("total_ventas"),
-            func.sum(Venta.total).label("total_monto"),
-        )
-        .join(Cliente, Cliente.id == Venta.cliente_id)
-        .group_by(Venta.cliente_id, Cliente.nombre)
-        .order_by(func.count(Venta.id).desc())
-        .limit(limit)
-    )
-    return q.all()
+    return db.execute(_SEL_CLIENTES_CON_MAS_VENTAS, {"limit": limit}).mappings().all()
 
 # -------------------- Detalles de venta --------------------
 
 def _recalcular_total_venta(db: Session, venta_id: int) -> None:
-    """Recalcula el total de una venta a partir de sus detalles."""
+    """
+    Recalcula el total de una venta a partir de sus detalles.
+
+    Se emite un único `UPDATE ventas SET total = (SELECT COALESCE(SUM(subtotal), 0) ...)`,
+    sin cargar la venta ni consultar la suma por separado.
+    """
     suma = (
-        db.query(
-            func.coalesce(
-                func.sum((DetalleVenta.precio - DetalleVenta.descuento) * DetalleVenta.cantidad),
-                0,
-            )
+        select(
+            func.coalesce(func.sum(DetalleVenta.subtotal), 0)
         )
-        .filter(DetalleVenta.venta_id == venta_id)
-        .scalar()
+        .where(DetalleVenta.venta_id == venta_id)
+        .scalar_subquery()
     )
-    venta = db.query(Venta).filter(Venta.id == venta_id).first()
-    if venta:
-        venta.total = int(suma or 0)
-        db.flush()
+    db.execute(update(Venta).where(Venta.id == venta_id).values(total=suma))
 
 def create_detalle(db: Session, data: DetalleVentaCreateStandalone) -> DetalleVenta:
     """Crear un detalle para una venta existente y actualizar el total."""
@@ -249,16 +316,17 @@ def create_detalle(db: Session, data: DetalleVentaCreateStandalone) -> DetalleVe
         precio=data.precio,
         descuento=data.descuento,
         cantidad=data.cantidad,
+        subtotal=_subtotal(data.precio, data.descuento, data.cantidad),
     )
     db.add(detalle)
     db.flush()
     _recalcular_total_venta(db, data.venta_id)
     db.commit()
-    db.refresh(detalle)
+    _refrescar_pendientes(db, detalle)
     return detalle
 
 def get_detalle(db: Session, detalle_id: int) -> Optional[DetalleVenta]:
-    return db.query(DetalleVenta).filter(DetalleVenta.id == detalle_id).first()
+    return db.get(DetalleVenta, detalle_id)
 
 def update_detalle(db: Session, detalle_id: int, data: DetalleVentaUpdate) -> Optional[DetalleVenta]:
     det = get_detalle(db, detalle_id)
@@ -266,22 +334,42 @@ def update_detalle(db: Session, detalle_id: int, data: DetalleVentaUpdate) -> Op
         return None
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(det, field, value)
+    det.subtotal = _subtotal(det.precio, det.descuento, det.cantidad)
     db.flush()
     _recalcular_total_venta(db, det.venta_id)
     db.commit()
-    db.refresh(det)
     return det
 
 def delete_detalle(db: Session, detalle_id: int) -> bool:
-    det = get_detalle(db, detalle_id)
-    if not det:
+    # RETURNING entrega la venta afectada en el mismo DELETE, sin consultarla antes.
+    venta_id = db.execute(
+        delete(DetalleVenta)
+        .where(DetalleVenta.id == detalle_id)
+        .returning(DetalleVenta.venta_id)
+    ).scalar_one_or_none()
+    if venta_id is None:
         return False
-    venta_id = det.venta_id
-    db.delete(det)
-    db.flush()
     _recalcular_total_venta(db, venta_id)
     db.commit()
     return True
 
-def list_detalles(db: Session, skip: int = 0, limit: int = 100) -> List[DetalleVenta]:
-    return db.query(DetalleVenta).offset(skip).limit(limit).all()
+def list_detalles(db: Session, after_id: int = 0, limit: int = 100) -> List[DetalleVenta]:
+    return (
+        db.query(DetalleVenta)
+        .filter(DetalleVenta.id > after_id)
+        .order_by(DetalleVenta.id)
+        .limit(limit)
+        .all()
+    )
+
+def list_detalles_por_venta(db: Session, venta_id: int) -> Optional[List[DetalleVenta]]:
+    """
+    Listar los detalles de una venta consultando `detalles_ventas` directamente.
+
+    Retorna None si la venta no existe; solo en ese caso (sin detalles) se comprueba su
+    existencia, sin cargar la fila de la venta.
+    """
+    detalles = db.execute(_SEL_DETALLES_POR_VENTA, {"venta_id": venta_id}).scalars().all()
+    if not detalles and db.execute(_SEL_VENTA_EXISTE, {"id": venta_id}).first() is None:
+        return None
+    return detalles
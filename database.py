@@ -10,34 +10,98 @@ Usamos SQLite para simplificar la evaluación (archivo local `app.db`). Para evi
 maneja peticiones concurrentes.
 """
 
+import sqlite3
+
 from sqlalchemy import create_engine, event
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 # URL de conexión. Para un archivo local basta con la ruta relativa.
 SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
 
-# Engine de SQLAlchemy. `connect_args` es específico de SQLite.
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}
+# Opciones del engine según el motor. `connect_args` es específico de SQLite y
+# `executemany_mode` de psycopg2, donde "values_plus_batch" pliega los executemany de
+# INSERT en INSERT multi-VALUES y agrupa los UPDATE/DELETE masivos, para cuando la
+# aplicación deje SQLite. En SQLite los detalles de `create_venta`
+# (`bulk_insert_mappings`) van por `cursor.executemany`.
+_url = make_url(SQLALCHEMY_DATABASE_URL)
+_ES_SQLITE = _url.get_backend_name() == "sqlite"
+_engine_kwargs = {}
+
+# Pool de conexiones (QueuePool): se mantienen conexiones abiertas y reutilizables entre
+# peticiones para no pagar la apertura en cada request.
+_engine_kwargs.update(
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
+)
+if _ES_SQLITE:
+    _engine_kwargs["connect_args"] = {"check_same_thread": False}
+else:
+    # Solo para servidores de BD: `pool_pre_ping` descarta conexiones cortadas por la red
+    # o el servidor antes de entregarlas (a costa de un `SELECT 1` por checkout) y
+    # `pool_recycle` las renueva cada hora. Con un archivo SQLite local no aportan nada.
+    _engine_kwargs.update(pool_recycle=3600, pool_pre_ping=True)
+    if _url.get_driver_name() == "psycopg2":
+        _engine_kwargs["executemany_mode"] = "values_plus_batch"
+
+# Engine de SQLAlchemy.
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_kwargs)
+
+# PRAGMAs de SQLite aplicados en cada conexión nueva. `foreign_keys=ON` es obligatorio
+# (de él depende el `ON DELETE CASCADE`) y se ejecuta primero y sin capturar errores.
+# Los siguientes solo afectan al rendimiento:
+# - `synchronous=NORMAL`: seguro con WAL y evita un fsync por cada commit.
+# - `mmap_size=256 MiB`: lecturas mediante memoria mapeada en lugar de `read()`.
+# - `cache_size=-65536`: caché de páginas de 64 MiB por conexión.
+# - `temp_store=MEMORY`: tablas temporales (GROUP BY / ORDER BY de reportes) en memoria.
+_SQLITE_PRAGMAS_RENDIMIENTO = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
 )
 
-# Activar enforcement de claves foráneas en SQLite en cada conexión
-@event.listens_for(engine, "connect")
+# El modo WAL (lectores concurrentes mientras otra conexión escribe) se guarda en el
+# propio archivo de la BD. La marca es por proceso, no por archivo: se intenta en cada
+# conexión nueva hasta que una lo logra y desde entonces se omite en este proceso.
+_wal_activado = False
+
 def _set_sqlite_pragma(dbapi_connection, connection_record):
+    global _wal_activado
+    cursor = dbapi_connection.cursor()
     try:
-        cursor = dbapi_connection.cursor()
         cursor.execute("PRAGMA foreign_keys=ON")
+        # Algunos PRAGMAs (y el cambio a WAL) leen el esquema y fallan con "database is
+        # locked" si otra conexión tiene la BD bloqueada. Cada uno se intenta por separado
+        # para que ese fallo no impida aplicar los demás ni deje la conexión inutilizable.
+        for pragma in _SQLITE_PRAGMAS_RENDIMIENTO:
+            try:
+                cursor.execute(pragma)
+            except sqlite3.OperationalError:
+                pass
+        if not _wal_activado:
+            try:
+                cursor.execute("PRAGMA journal_mode=WAL")
+                _wal_activado = True
+            except sqlite3.OperationalError:
+                pass
+    finally:
         cursor.close()
-    except Exception:
-        # En caso de motores no SQLite, ignorar silenciosamente
-        pass
+
+# Solo se registra para SQLite: en otros motores un PRAGMA fallido dejaría la conexión
+# nueva con la transacción abortada (p. ej. psycopg2).
+if _ES_SQLITE:
+    event.listen(engine, "connect", _set_sqlite_pragma)
 
 # Fábrica de sesiones: sin autocommit y sin autoflush para tener control explícito.
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# `expire_on_commit=False` mantiene válidos los atributos tras el commit, de modo que
+# los objetos recién creados o actualizados se pueden serializar sin volver a la BD.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
-# Clase base que heredarán todos los modelos ORM.
-Base = declarative_base()
+# Clase base que heredarán todos los modelos ORM (estilo declarativo de SQLAlchemy 2.0).
+class Base(DeclarativeBase):
+    pass
 
 def get_db():
     """
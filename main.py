@@ -8,8 +8,9 @@ No se implementa autenticación según los requisitos de la consigna.
 Swagger/OpenAPI se expone automáticamente en `/docs` y Redoc en `/redoc`.
 """
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Response, status
 from fastapi.responses import RedirectResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -25,6 +26,26 @@ Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="API Ventas", version="1.0.0", description="CRUD de clientes, productos y ventas con reportes básicos.")
 
+# Adaptadores de los listados, construidos una sola vez al importar. `_json_lista` valida
+# la lista de objetos ORM hacia los esquemas `*Out` (se crea un modelo por fila, igual
+# que con `response_model`) y luego vuelca esos modelos directamente a bytes JSON con
+# `dump_json`, omitiendo el paso de FastAPI por dicts + codificador JSON. Las rutas
+# mantienen `response_model` para documentar el esquema en OpenAPI; al devolver un
+# `Response` FastAPI no vuelve a validar ni serializar el contenido.
+_CLIENTES_ADAPTER = TypeAdapter(List[schemas.ClienteOut])
+_PRODUCTOS_ADAPTER = TypeAdapter(List[schemas.ProductoOut])
+_VENTAS_ADAPTER = TypeAdapter(List[schemas.VentaOut])
+_DETALLES_ADAPTER = TypeAdapter(List[schemas.DetalleVentaOut])
+# Reportes: las filas (`RowMapping`) se validan hacia los esquemas de reporte (un modelo
+# por fila) y se vuelcan a bytes JSON del mismo modo que los listados.
+_PRODUCTOS_MAS_VENDIDOS_ADAPTER = TypeAdapter(List[schemas.ProductoMasVendido])
+_CLIENTES_CON_MAS_VENTAS_ADAPTER = TypeAdapter(List[schemas.ClienteConMasVentas])
+
+def _json_lista(adapter: TypeAdapter, rows) -> Response:
+    """ Valida `rows` con el `TypeAdapter` indicado y responde con su volcado JSON (bytes). """
+    data = adapter.validate_python(rows, from_attributes=True)
+    return Response(content=adapter.dump_json(data), media_type="application/json")
+
 # Ruta raíz: redirige a la documentación
 @app.get("/", include_in_schema=False)
 def root():
@@ -38,9 +59,9 @@ def crear_cliente(data: schemas.ClienteCreate, db: Session = Depends(get_db)):
     return crud.create_cliente(db, data)
 
 @app.get("/clientes", response_model=List[schemas.ClienteOut], summary="Listar clientes")
-def listar_clientes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """ Lista clientes con paginación simple usando `skip` y `limit`. """
-    return crud.list_clientes(db, skip, limit)
+def listar_clientes(after_id: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """ Lista clientes paginando por clave: `after_id` (último `id` recibido) y `limit`. """
+    return _json_lista(_CLIENTES_ADAPTER, crud.list_clientes(db, after_id, limit))
 
 @app.get("/clientes/{cliente_id}", response_model=schemas.ClienteOut, summary="Obtener cliente")
 def obtener_cliente(cliente_id: int, db: Session = Depends(get_db)):
@@ -74,9 +95,9 @@ def crear_producto(data: schemas.ProductoCreate, db: Session = Depends(get_db)):
     return crud.create_producto(db, data)
 
 @app.get("/productos", response_model=List[schemas.ProductoOut], summary="Listar productos")
-def listar_productos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """ Lista productos con paginación simple usando `skip` y `limit`. """
-    return crud.list_productos(db, skip, limit)
+def listar_productos(after_id: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """ Lista productos paginando por clave: `after_id` (último `id` recibido) y `limit`. """
+    return _json_lista(_PRODUCTOS_ADAPTER, crud.list_productos(db, after_id, limit))
 
 @app.get("/productos/{producto_id}", response_model=schemas.ProductoOut, summary="Obtener producto")
 def obtener_producto(producto_id: int, db: Session = Depends(get_db)):
@@ -110,9 +131,9 @@ def crear_venta(data: schemas.VentaCreate, db: Session = Depends(get_db)):
     return crud.create_venta(db, data)
 
 @app.get("/ventas", response_model=List[schemas.VentaOut], summary="Listar ventas")
-def listar_ventas(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """ Lista ventas con paginación simple usando `skip` y `limit`. """
-    return crud.list_ventas(db, skip, limit)
+def listar_ventas(after_id: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """ Lista ventas paginando por clave: `after_id` (último `id` recibido) y `limit`. """
+    return _json_lista(_VENTAS_ADAPTER, crud.list_ventas(db, after_id, limit))
 
 @app.get("/ventas/{venta_id}", response_model=schemas.VentaOut, summary="Obtener venta")
 def obtener_venta(venta_id: int, db: Session = Depends(get_db)):
@@ -165,43 +186,24 @@ def eliminar_detalle(detalle_id: int, db: Session = Depends(get_db)):
     return None
 
 @app.get("/detalles", response_model=List[schemas.DetalleVentaOut], summary="Listar detalles")
-def listar_detalles(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.list_detalles(db, skip, limit)
+def listar_detalles(after_id: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    return _json_lista(_DETALLES_ADAPTER, crud.list_detalles(db, after_id, limit))
 
 @app.get("/ventas/{venta_id}/detalles", response_model=List[schemas.DetalleVentaOut], summary="Listar detalles por venta")
 def listar_detalles_por_venta(venta_id: int, db: Session = Depends(get_db)):
-    venta = crud.get_venta(db, venta_id)
-    if not venta:
+    detalles = crud.list_detalles_por_venta(db, venta_id)
+    if detalles is None:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
-    # devolver detalles asociados
-    return venta.detalles
+    return _json_lista(_DETALLES_ADAPTER, detalles)
 
 # ---------------------- Reportes ----------------------
 
-@app.get("/reportes/productos-mas-vendidos", summary="Ranking de productos más vendidos")
+@app.get("/reportes/productos-mas-vendidos", response_model=List[schemas.ProductoMasVendido], summary="Ranking de productos más vendidos")
 def reporte_productos(limit: int = 10, db: Session = Depends(get_db)):
     """ Devuelve un ranking de los productos más vendidos. """
-    rows = crud.productos_mas_vendidos(db, limit)
-    return [
-        {
-            "producto_id": r.producto_id,
-            "nombre": r.nombre,
-            "total_cantidad": r.total_cantidad,
-            "total_ingresos": r.total_ingresos,
-        }
-        for r in rows
-    ]
-
-@app.get("/reportes/clientes-mas-ventas", summary="Ranking de clientes con más ventas")
+    return _json_lista(_PRODUCTOS_MAS_VENDIDOS_ADAPTER, crud.productos_mas_vendidos(db, limit))
+
+@app.get("/reportes/clientes-mas-ventas", response_model=List[schemas.ClienteConMasVentas], summary="Ranking de clientes con más ventas")
 def reporte_clientes(limit: int = 10, db: Session = Depends(get_db)):
     """ Devuelve un ranking de los clientes con más ventas. """
-    rows = crud.clientes_con_mas_ventas(db, limit)
-    return [
-        {
-            "cliente_id": r.cliente_id,
-            "nombre": r.nombre,
-            "total_ventas": r.total_ventas,
-            "total_monto": r.total_monto,
-        }
-        for r in rows
-    ]
+    return _json_lista(_CLIENTES_CON_MAS_VENTAS_ADAPTER, crud.clientes_con_mas_ventas(db, limit))
@@ -3,13 +3,20 @@ Modelos ORM para la aplicación de ventas.
 
 Cada clase representa una tabla en la base de datos SQLite. Se definen relaciones
 bidireccionales para facilitar el acceso a datos asociados (por ejemplo `cliente.ventas`
-ó `venta.detalles`). Las marcas de tiempo se gestionan con valores por defecto y
-`onupdate` para `modified_at`.
+ó `venta.detalles`). Las marcas de tiempo las genera la propia BD: `server_default`
+(`DEFAULT CURRENT_TIMESTAMP`, en UTC) al insertar y, para `modified_at`, un `onupdate`
+que se emite como `SET modified_at = CURRENT_TIMESTAMP` dentro del mismo UPDATE.
+
+Se usa el estilo declarativo de SQLAlchemy 2.0 (`Mapped` + `mapped_column`): el tipo
+anotado define también la nulabilidad (`Optional[...]` → columna NULL). Con
+`eager_defaults` los valores generados por la BD (como las marcas de tiempo) se
+obtienen en el mismo INSERT/UPDATE (RETURNING) en lugar de un SELECT posterior.
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from typing import List, Optional
+from sqlalchemy import Integer, String, DateTime, ForeignKey, Index, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from database import Base
 
@@ -22,33 +29,36 @@ class Cliente(Base):
     - `rut` y `email` marcados como únicos para evitar duplicados.
     """
     __tablename__ = "clientes"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True, index=True)
-    uuid = Column(String, unique=True, index=True)
-    nombre = Column(String, nullable=False, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
-    rut = Column(String, unique=True, index=True, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    modified_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    uuid: Mapped[Optional[str]] = mapped_column(String, unique=True, index=True)
+    nombre: Mapped[str] = mapped_column(String, index=True)
+    email: Mapped[str] = mapped_column(String, unique=True, index=True)
+    rut: Mapped[str] = mapped_column(String, unique=True, index=True)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.current_timestamp())
+    modified_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
 
     # Relación 1:N (un cliente tiene muchas ventas)
-    ventas = relationship("Venta", back_populates="cliente", cascade="all, delete-orphan")
+    # `passive_deletes` delega el borrado en cascada al `ON DELETE CASCADE` de la FK.
+    ventas: Mapped[List["Venta"]] = relationship(back_populates="cliente", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Producto(Base):
     """ Tabla de productos disponibles para la venta. """
     __tablename__ = "productos"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True, index=True)
-    uuid = Column(String, unique=True, index=True)
-    nombre = Column(String, nullable=False, index=True)
-    categoria = Column(String, index=True)
-    precio = Column(Integer, nullable=False)  # Precio base unitario
-    created_at = Column(DateTime, default=datetime.utcnow)
-    modified_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    uuid: Mapped[Optional[str]] = mapped_column(String, unique=True, index=True)
+    nombre: Mapped[str] = mapped_column(String, index=True)
+    categoria: Mapped[Optional[str]] = mapped_column(String, index=True)
+    precio: Mapped[int] = mapped_column(Integer)  # Precio base unitario
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.current_timestamp())
+    modified_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
 
     # Relación con detalles de ventas en que aparece este producto
-    detalles = relationship("DetalleVenta", back_populates="producto")
+    detalles: Mapped[List["DetalleVenta"]] = relationship(back_populates="producto")
 
 
 class Venta(Base):
@@ -59,17 +69,22 @@ class Venta(Base):
     se encuentran en la tabla `detalles_ventas`.
     """
     __tablename__ = "ventas"
+    __table_args__ = (
+        # Acelera el reporte de clientes con más ventas (agrupa por cliente).
+        Index("ix_ventas_cliente", "cliente_id"),
+    )
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True, index=True)
-    uuid = Column(String, unique=True, index=True)
-    fecha = Column(DateTime, default=datetime.utcnow)
-    total = Column(Integer, default=0)  # Se actualizará al crear los detalles
-    created_at = Column(DateTime, default=datetime.utcnow)
-    modified_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    cliente_id = Column(Integer, ForeignKey("clientes.id"), nullable=False)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    uuid: Mapped[Optional[str]] = mapped_column(String, unique=True, index=True)
+    fecha: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.current_timestamp())
+    total: Mapped[Optional[int]] = mapped_column(Integer, default=0)  # Se actualizará al crear los detalles
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.current_timestamp())
+    modified_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
+    cliente_id: Mapped[int] = mapped_column(Integer, ForeignKey("clientes.id", ondelete="CASCADE"))
 
-    cliente = relationship("Cliente", back_populates="ventas")
-    detalles = relationship("DetalleVenta", back_populates="venta", cascade="all, delete-orphan")
+    cliente: Mapped["Cliente"] = relationship(back_populates="ventas")
+    detalles: Mapped[List["DetalleVenta"]] = relationship(back_populates="venta", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class DetalleVenta(Base):
@@ -79,18 +94,31 @@ class DetalleVenta(Base):
     Guarda el precio aplicado (que puede ser diferente al precio actual del
     producto para mantener historicidad), un posible descuento unitario y la
     cantidad. Permite recrear exactamente el valor de la venta en su momento.
+    El `subtotal` se guarda ya calculado al crear o modificar el detalle.
     """
     __tablename__ = "detalles_ventas"
-
-    id = Column(Integer, primary_key=True, index=True)
-    uuid = Column(String, unique=True, index=True)
-    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
-    venta_id = Column(Integer, ForeignKey("ventas.id"), nullable=False)
-    precio = Column(Integer, nullable=False)
-    descuento = Column(Integer, default=0)
-    cantidad = Column(Integer, default=1)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    modified_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-    producto = relationship("Producto", back_populates="detalles")
-    venta = relationship("Venta", back_populates="detalles")
+    __table_args__ = (
+        # Detalles de una venta (recálculo del total y `/ventas/{id}/detalles`).
+        Index("ix_dv_venta_id", "venta_id"),
+        # Índice cubriente del ranking de productos más vendidos: agrega cantidad/subtotal
+        # sin leer la tabla. Su prefijo `producto_id` también sirve a las búsquedas por
+        # producto (p. ej. la verificación de la FK al eliminar un producto).
+        Index("ix_dv_prod_subtotal", "producto_id", "subtotal", "cantidad"),
+    )
+    __mapper_args__ = {"eager_defaults": True}
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    uuid: Mapped[Optional[str]] = mapped_column(String, unique=True, index=True)
+    producto_id: Mapped[int] = mapped_column(Integer, ForeignKey("productos.id"))
+    venta_id: Mapped[int] = mapped_column(Integer, ForeignKey("ventas.id", ondelete="CASCADE"))
+    precio: Mapped[int] = mapped_column(Integer)
+    descuento: Mapped[Optional[int]] = mapped_column(Integer, default=0)
+    cantidad: Mapped[Optional[int]] = mapped_column(Integer, default=1)
+    # `(precio - descuento) * cantidad`, desnormalizado al escribir para que los totales
+    # y reportes sumen una columna en lugar de evaluar la expresión fila a fila.
+    subtotal: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.current_timestamp())
+    modified_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+    producto: Mapped["Producto"] = relationship(back_populates="detalles")
+    venta: Mapped["Venta"] = relationship(back_populates="detalles")
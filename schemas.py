@@ -4,15 +4,30 @@ Se separan los modelos de entrada (Create / Update) de los de salida (Out) para
 controlar qué campos expone la API y cuáles se reciben del cliente. Las clases
 `Base` agrupan atributos comunes.
 """
+import re
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, EmailStr
+from typing import Annotated, List, Optional
+from pydantic import AfterValidator, BaseModel, WithJsonSchema
+
+# --------- Tipos comunes ---------
+# Email validado con una expresión precompilada: `local@dominio.tld`. Los segmentos del
+# dominio excluyen el punto, de modo que el patrón no es ambiguo y `re` lo evalúa en
+# tiempo lineal (sin backtracking catastrófico) y sin depender de `email-validator`.
+_EMAIL_RE = re.compile(r"[^@\s]+@[^@\s.]+(?:\.[^@\s.]+)+")
+
+def _validar_email(value: str) -> str:
+    """Valida el formato del email (máximo 254 caracteres) o levanta `ValueError`."""
+    if len(value) > 254 or _EMAIL_RE.fullmatch(value) is None:
+        raise ValueError("value is not a valid email address")
+    return value
+
+Email = Annotated[str, AfterValidator(_validar_email), WithJsonSchema({"type": "string", "format": "email"})]
 
 # --------- Cliente ---------
 class ClienteBase(BaseModel):
     """Campos compartidos entre creación y lectura de un cliente."""
     nombre: str
-    email: EmailStr
+    email: Email
     rut: str
 
 class ClienteCreate(ClienteBase):
@@ -24,7 +39,7 @@ class ClienteCreate(ClienteBase):
 class ClienteUpdate(BaseModel):
     """Modelo de entrada para actualización parcial (PUT o PATCH)."""
     nombre: Optional[str] = None
-    email: Optional[EmailStr] = None
+    email: Optional[Email] = None
     rut: Optional[str] = None
 
 class ClienteOut(ClienteBase):